@@ -35,7 +35,7 @@ socket.on('esp32_status', (status) => {
   }
 });
 
-socket.on('esp32_data', (data) => {
+function handleESP32Data(data) {
   // Removed frequent heartbeat log to reduce console noise
   // Only log non-status messages (hits, winners, etc.)
   if (data.type !== 'status') {
@@ -83,12 +83,25 @@ socket.on('esp32_data', (data) => {
       console.log(`Winner message for ${data.winner} ignored - round already complete`);
     }
   }
+}
+
+socket.on('esp32_data', handleESP32Data);
+
+// Bursts of ESP32 messages arrive coalesced into a single frame
+socket.on('esp32_data_batch', (batch) => {
+  batch.forEach(handleESP32Data);
 });
 
-socket.on('esp32_status_message', (data) => {
+function handleESP32StatusMessage(data) {
   console.log('ESP32 Status:', data.message);
   // Display status messages in the console for now
   // You could add a status display area to the UI if needed
+}
+
+socket.on('esp32_status_message', handleESP32StatusMessage);
+
+socket.on('esp32_status_message_batch', (batch) => {
+  batch.forEach(handleESP32StatusMessage);
 });
 
 // Function to send commands to ESP32
@@ -3,7 +3,7 @@ import http from "http";
 import { Server } from "socket.io";
 import cors from "cors";
 import { SerialPort } from "serialport";
-import { ReadlineParser } from "@serialport/parser-readline";
+import { StringDecoder } from "string_decoder";
 import fs from "fs";
 import path from "path";
 import multer from "multer";
@@ -18,6 +18,10 @@ const io = new Server(server, {
   }
 });
 
+// Per-message serial and socket logging is only enabled with DEBUG_BRIDGE=1;
+// otherwise every ESP32 line and client command would be formatted and printed
+const DEBUG_BRIDGE = process.env.DEBUG_BRIDGE === '1';
+
 // Helper function to sanitize filenames - removes problematic characters
 function sanitizeFilename(filename) {
   if (!filename) return 'file';
@@ -613,7 +617,25 @@ app.get("/api/quiz-files", (req, res) => {
   }
 });
 
-app.use(express.static(".")); // serve files from home directory (AFTER API routes)
+// Maximum number of clients written to per event loop turn when broadcasting.
+// Larger audiences are sent in batches, yielding to the loop between them so
+// incoming socket reads and serial data are not starved.
+const BROADCAST_BATCH_SIZE = 50;
+
+// Serial-originated broadcasts arriving within this window are coalesced, each run
+// of the same event becoming one '<event>_batch' frame (flushed early once full)
+const SERIAL_COALESCE_MS = 10;
+const SERIAL_COALESCE_MAX = 64;
+
+// The heartbeat never changes, so its serial line is serialized once up front
+const HEARTBEAT_LINE = JSON.stringify({ cmd: 'heartbeat' }) + '\n';
+
+// Clients with this many packets still unsent are too slow to keep up and are
+// disconnected (they reconnect and resync) rather than buffering without bound
+const MAX_CLIENT_BACKLOG = 256;
+
+// Commands written to the ESP32 within this window go out in a single serial write
+const SERIAL_WRITE_COALESCE_MS = 2;
 
 // ESP32 Serial Communication
 class ESP32Bridge {
@@ -621,7 +643,8 @@ class ESP32Bridge {
     this.serialPort = serialPort;
     this.baudRate = baudRate;
     this.serialConnection = null;
-    this.parser = null;
+    this.rxBuffer = ''; // Partial serial line carried over between reads
+    this.rxDecoder = null; // UTF-8 decoder for the current serial connection
     this.io = io;
     this.enabled = false; // Track if serial is enabled
     this.lightboardConnected = false; // Track if physical lightboard is connected via ESP-NOW
@@ -629,6 +652,13 @@ class ESP32Bridge {
     this.player2Connected = false; // Track if Player 2 is connected via ESP-NOW
     this.retryTimeout = null; // Track retry timeout for cleanup
     this.heartbeatInterval = null; // Track heartbeat interval timer
+    this.outbox = []; // Serial-originated [event, data] broadcasts, in arrival order
+    this.flushTimeout = null; // Track outbox flush timer
+    this.clientIds = []; // Connected socket ids, rebuilt only when clients join or leave
+    this.batchBacklog = null; // Broadcasts waiting behind a batched send, null when idle
+    this.serialTxBuffer = ''; // Command lines waiting to be written to the ESP32
+    this.serialTxCommands = []; // JSON of the commands in serialTxBuffer, echoed once written
+    this.serialTxTimeout = null; // Track serial write flush timer
     // Removed debounce variables - ESP32 handles awarding internally
   }
 
@@ -655,7 +685,7 @@ class ESP32Bridge {
         this.lightboardConnected = false;
         this.player1Connected = false;
         this.player2Connected = false;
-        this.io.emit('esp32_status', { 
+        this.broadcast('esp32_status', { 
           connected: false, 
           enabled: false,
           lightboardConnected: false,
@@ -672,12 +702,13 @@ class ESP32Bridge {
         autoOpen: false
       });
 
-      this.parser = this.serialConnection.pipe(new ReadlineParser({ delimiter: '\n' }));
+      this.rxBuffer = '';
+      this.rxDecoder = new StringDecoder('utf8');
       
       this.serialConnection.on('open', () => {
         console.log(`Connected to ESP32 on ${this.serialPort}`);
         // Notify all clients that ESP32 is connected
-        this.io.emit('esp32_status', { 
+        this.broadcast('esp32_status', { 
           connected: true, 
           enabled: true,
           lightboardConnected: this.lightboardConnected,
@@ -698,7 +729,7 @@ class ESP32Bridge {
         this.player1Connected = false; // Reset player connections
         this.player2Connected = false;
         // Notify all clients that ESP32 is disconnected
-        this.io.emit('esp32_status', { 
+        this.broadcast('esp32_status', { 
           connected: false, 
           enabled: false,
           lightboardConnected: false,
@@ -709,8 +740,8 @@ class ESP32Bridge {
         this.retryTimeout = setTimeout(() => this.startSerialCommunication(), 5000);
       });
 
-      this.parser.on('data', (data) => {
-        this.handleSerialMessage(data.trim());
+      this.serialConnection.on('data', (chunk) => {
+        this.handleSerialData(chunk);
       });
 
       // Open the connection
@@ -730,7 +761,7 @@ class ESP32Bridge {
       this.player2Connected = false;
       this.player3Connected = false;
       // Notify all clients that ESP32 is disconnected
-      this.io.emit('esp32_status', { 
+      this.broadcast('esp32_status', { 
         connected: false, 
         enabled: false,
         lightboardConnected: false,
@@ -742,11 +773,40 @@ class ESP32Bridge {
     }
   }
 
+  // A single read can hold several lines, or only part of one. Split out every
+  // complete line in one pass and carry the trailing partial line over.
+  handleSerialData(chunk) {
+    const text = this.rxBuffer + this.rxDecoder.write(chunk);
+    const end = text.lastIndexOf('\n');
+    if (end === -1) {
+      this.rxBuffer = text;
+      return;
+    }
+    this.rxBuffer = text.substring(end + 1);
+
+    for (const line of text.substring(0, end).split('\n')) {
+      const message = line.trim();
+      if (message) {
+        this.handleSerialMessage(message);
+      }
+    }
+  }
+
   handleSerialMessage(message) {
+    // Most ESP32 debug output is plain text - check the first character so those
+    // lines skip the JSON parser and the exception it would throw
+    const first = message[0];
+    if (first !== '{' && first !== '[') {
+      this.handleTextMessage(message);
+      return;
+    }
+
     try {
       // Parse JSON message from ESP32
       const data = JSON.parse(message);
-      console.log('Received from ESP32:', data);
+      if (DEBUG_BRIDGE) {
+        console.log('Received from ESP32:', data);
+      }
       
       // Check if this is a status message with connection info
       if (data.type === 'status') {
@@ -782,7 +842,7 @@ class ESP32Bridge {
         
         // Always emit status update when we receive status from Bridge
         // This ensures initial state is set and clients are kept in sync
-        this.io.emit('esp32_status', { 
+        this.broadcast('esp32_status', { 
           connected: this.serialConnection ? this.serialConnection.isOpen : false,
           enabled: this.enabled,
           lightboardConnected: this.lightboardConnected,
@@ -824,30 +884,152 @@ class ESP32Bridge {
         console.log('Reset lightboard state from ESP32');
       }
       
-      // Forward to all Socket.IO clients
-      this.io.emit('esp32_data', data);
+      // Forward to all Socket.IO clients (coalesced with any burst in progress)
+      this.queueBroadcast('esp32_data', data);
       
     } catch (error) {
-      // Handle non-JSON messages (like debug output)
+      this.handleTextMessage(message);
+    }
+  }
+
+  handleTextMessage(message) {
+    // Handle non-JSON messages (like debug output)
+    if (DEBUG_BRIDGE) {
       console.log('Non-JSON message from ESP32:', message);
+    }
 
-      // Forward important status messages to frontend
-      if (message.includes('heartbeat') || 
-          message.includes('Clock sync') || 
-          message.includes('lightboard') ||
-          message.includes('Player') ||
-          message.includes('Status')) {
-        
-        // Send status message to frontend
-        this.io.emit('esp32_status_message', {
-          type: 'status',
-          message: message,
-          timestamp: new Date().toISOString()
-        });
+    // Forward important status messages to frontend
+    if (message.includes('heartbeat') || 
+        message.includes('Clock sync') || 
+        message.includes('lightboard') ||
+        message.includes('Player') ||
+        message.includes('Status')) {
+      
+      // Send status message to frontend
+      this.queueBroadcast('esp32_status_message', {
+        type: 'status',
+        message: message,
+        timestamp: new Date().toISOString()
+      });
+    }
+  }
+
+  // Hand a serial-originated message to the outbox. A single timer drains
+  // everything queued in the meantime, so a burst of lines costs one wake-up.
+  queueBroadcast(event, data) {
+    this.outbox.push([event, data]);
+
+    if (this.outbox.length >= SERIAL_COALESCE_MAX) {
+      this.flushOutbox();
+    } else if (!this.flushTimeout) {
+      this.flushTimeout = setTimeout(() => this.flushOutbox(), SERIAL_COALESCE_MS);
+    }
+  }
+
+  flushOutbox() {
+    if (this.flushTimeout) {
+      clearTimeout(this.flushTimeout);
+      this.flushTimeout = null;
+    }
+
+    const outbox = this.outbox;
+    if (outbox.length === 0) {
+      return;
+    }
+    this.outbox = [];
+
+    // Consecutive messages with the same event go out as one frame; order across
+    // events is kept, so coalescing only ever delays a message, never reorders it
+    let start = 0;
+    while (start < outbox.length) {
+      const event = outbox[start][0];
+      let end = start + 1;
+      while (end < outbox.length && outbox[end][0] === event) {
+        end++;
+      }
+
+      // A lone message keeps the plain event name
+      if (end - start === 1) {
+        this.emitToClients(event, outbox[start][1]);
+      } else {
+        this.emitToClients(`${event}_batch`, outbox.slice(start, end).map(([, data]) => data));
+      }
+      start = end;
+    }
+  }
+
+  // Socket.IO queues per client, so one slow client never holds up the rest;
+  // this just stops a stalled client's queue from growing forever.
+  dropSlowClients() {
+    for (const socket of this.io.sockets.sockets.values()) {
+      if (socket.conn.writeBuffer.length >= MAX_CLIENT_BACKLOG) {
+        console.warn(`Disconnecting slow client ${socket.id}: ${socket.conn.writeBuffer.length} packets pending`);
+        socket.disconnect(true);
       }
     }
   }
 
+  // Fan out an event to all connected Socket.IO clients, on Node's single event
+  // loop. Anything still coalescing in the outbox is older, so it goes out
+  // first; if a batched send is still in flight, the event queues behind it.
+  broadcast(event, data) {
+    this.flushOutbox();
+    this.emitToClients(event, data);
+  }
+
+  emitToClients(event, data) {
+    // While a batched send is in flight, anything sent now would overtake it
+    // for clients in its later batches - wait behind it instead
+    if (this.batchBacklog) {
+      this.batchBacklog.push([event, data]);
+      return;
+    }
+
+    // Every fan-out enforces the backlog limit before adding to client queues
+    this.dropSlowClients();
+
+    const ids = this.clientIds;
+
+    // Small audiences (the normal case) go out in one synchronous emit
+    if (ids.length <= BROADCAST_BATCH_SIZE) {
+      this.io.emit(event, data);
+      return;
+    }
+
+    this.batchBacklog = [];
+    this.broadcastBatch(ids, event, data, 0);
+  }
+
+  // Called on every connect/disconnect. The namespace only tracks live sockets,
+  // and the array is replaced rather than mutated, so a batched broadcast that
+  // is still in flight keeps its own snapshot without copying it.
+  refreshClients() {
+    this.clientIds = Array.from(this.io.sockets.sockets.keys());
+  }
+
+  broadcastBatch(ids, event, data, start) {
+    const end = start + BROADCAST_BATCH_SIZE;
+
+    // Every socket sits in a room named after its id, so targeting the batch's
+    // rooms lets the adapter encode the packet once per batch, not per client.
+    // Anyone who disconnects mid-broadcast simply drops out of the id rooms.
+    this.io.to(ids.slice(start, end)).emit(event, data);
+
+    // Yield to the event loop before the next batch
+    if (end < ids.length) {
+      setImmediate(() => this.broadcastBatch(ids, event, data, end));
+      return;
+    }
+
+    // Finished - send whatever queued up meanwhile, in order (a large audience
+    // starts a new batched send and the rest queue behind it again)
+    const backlog = this.batchBacklog;
+    this.batchBacklog = null;
+    for (const [queuedEvent, queuedData] of backlog) {
+      this.emitToClients(queuedEvent, queuedData);
+    }
+  }
+
   sendToESP32(command) {
     if (!this.enabled || !this.serialConnection || !this.serialConnection.isOpen) {
       console.warn('ESP32 serial connection not available - command ignored:', command);
@@ -855,15 +1037,10 @@ class ESP32Bridge {
     }
     
     try {
-      const message = JSON.stringify(command) + '\n';
-      this.serialConnection.write(message);
-      console.log('Sent to ESP32:', command);
-      // Surface to clients for debugging
-      this.io.emit('esp32_status_message', {
-        type: 'status',
-        message: `Sent to ESP32: ${JSON.stringify(command)}`,
-        timestamp: new Date().toISOString()
-      });
+      // Serialize once and reuse it for both the serial line and the status echo
+      // (the echo goes out from flushSerial, once the line is actually written)
+      const json = JSON.stringify(command);
+      this.writeSerial(json + '\n', json);
     } catch (error) {
       console.error('Error sending to ESP32:', error);
     }
@@ -894,11 +1071,58 @@ class ESP32Bridge {
       return;
     }
     
+    this.writeSerial(HEARTBEAT_LINE);
+  }
+
+  // Queue a command line for the ESP32. Lines queued close together (e.g. the
+  // reset + settings pair) are joined into one write, so one USB transfer.
+  writeSerial(line, json) {
+    this.serialTxBuffer += line;
+    if (json) {
+      this.serialTxCommands.push(json);
+    }
+    if (!this.serialTxTimeout) {
+      this.serialTxTimeout = setTimeout(() => this.flushSerial(), SERIAL_WRITE_COALESCE_MS);
+    }
+  }
+
+  flushSerial() {
+    if (this.serialTxTimeout) {
+      clearTimeout(this.serialTxTimeout);
+      this.serialTxTimeout = null;
+    }
+
+    const data = this.serialTxBuffer;
+    const commands = this.serialTxCommands;
+    this.serialTxBuffer = '';
+    this.serialTxCommands = [];
+
+    if (!data) {
+      return;
+    }
+
+    if (!this.serialConnection || !this.serialConnection.isOpen) {
+      console.warn('ESP32 serial connection closed before write - queued commands dropped:', commands);
+      return;
+    }
+
     try {
-      const message = JSON.stringify({ cmd: 'heartbeat' }) + '\n';
-      this.serialConnection.write(message);
+      this.serialConnection.write(data);
     } catch (error) {
-      console.error('Error sending heartbeat to Bridge:', error);
+      console.error('Error writing to ESP32:', error);
+      return;
+    }
+
+    for (const json of commands) {
+      if (DEBUG_BRIDGE) {
+        console.log('Sent to ESP32:', json);
+      }
+      // Surface to clients for debugging
+      this.broadcast('esp32_status_message', {
+        type: 'status',
+        message: `Sent to ESP32: ${json}`,
+        timestamp: new Date().toISOString()
+      });
     }
   }
 
@@ -912,11 +1136,21 @@ class ESP32Bridge {
       this.retryTimeout = null;
     }
 
-    // Remove parser event listeners
-    if (this.parser) {
-      this.parser.removeAllListeners();
-      this.parser = null;
+    // Deliver anything still waiting in the outbox
+    this.flushOutbox();
+
+    // Drop any partial line from the old connection
+    this.rxBuffer = '';
+    this.rxDecoder = null;
+
+    // Drop any queued commands rather than writing them now - a write still in
+    // flight when the port closes errors with no listener left to catch it
+    if (this.serialTxTimeout) {
+      clearTimeout(this.serialTxTimeout);
+      this.serialTxTimeout = null;
     }
+    this.serialTxBuffer = '';
+    this.serialTxCommands = [];
 
     // Close and cleanup serial connection
     if (this.serialConnection) {
@@ -1131,9 +1365,14 @@ app.get("/health", (req, res) => {
   });
 });
 
+// Serve files from home directory (AFTER all routes, so API and page requests
+// never pay for a filesystem lookup in the static handler before matching)
+app.use(express.static("."));
+
 // Socket.IO connection handling
 io.on("connection", (socket) => {
-  console.log("Client connected:", socket.id);
+  esp32Bridge.refreshClients();
+  console.log("Client connected:", socket.id, "Total clients:", esp32Bridge.clientIds.length);
   
   // Send current ESP32 status to new client
   socket.emit('esp32_status', { 
@@ -1146,7 +1385,9 @@ io.on("connection", (socket) => {
   
   // Handle commands from client to ESP32
   socket.on("esp32_command", (command) => {
-    console.log('Received command from client:', command);
+    if (DEBUG_BRIDGE) {
+      console.log('Received command from client:', command);
+    }
     
     // Update lightboard state based on command
     if (command.cmd === 'awardPoint' && command.player && command.multiplier) {
@@ -1171,10 +1412,10 @@ io.on("connection", (socket) => {
         p2Color: resetState.p2ColorIndex
       };
       esp32Bridge.sendToESP32(settingsCommand);
-      io.emit('esp32_command', settingsCommand);
+      esp32Bridge.broadcast('esp32_command', settingsCommand);
       
       // Broadcast the reset command to all connected clients (including lightboard emulator)
-      io.emit('esp32_command', command);
+      esp32Bridge.broadcast('esp32_command', command);
       return; // Don't send reset command again below
     } else if (command.cmd === 'lightboardSettings' && command.mode !== undefined) {
       lightboardState.updateSettings(command.mode, command.p1Color, command.p2Color);
@@ -1183,11 +1424,12 @@ io.on("connection", (socket) => {
     
     // Send command to ESP32 and broadcast to all clients (unless already handled above)
     esp32Bridge.sendToESP32(command);
-    io.emit('esp32_command', command);
+    esp32Bridge.broadcast('esp32_command', command);
   });
   
   socket.on("disconnect", () => {
-    console.log("Client disconnected:", socket.id);
+    esp32Bridge.refreshClients();
+    console.log("Client disconnected:", socket.id, "Total clients:", esp32Bridge.clientIds.length);
   });
 });
 